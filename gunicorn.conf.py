@@ -0,0 +1,19 @@
+# Production server settings: gunicorn -c gunicorn.conf.py app:app
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+# Threaded workers let requests overlap while one is waiting on the SQLite
+# writer or building a PDF; each worker process starts its own db-writer thread
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# PDF rendering can also be moved off the GIL with PDF_PROCESS_WORKERS=<n>,
+# which gives each worker its own pool of n render processes (see app.py)
+
+# Import app.py (and reportlab with it) once in the master; workers are forked
+# with it already loaded instead of each paying the import. The db-writer
+# thread and PDF process pool start lazily, so nothing is shared across the fork.
+preload_app = True
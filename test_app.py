@@ -0,0 +1,164 @@
+import base64
+import gzip
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+# app.py creates consultations.db and reports/ in the working directory on import
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(tempfile.mkdtemp())
+
+import app
+
+
+class VitalsTest(unittest.TestCase):
+    def test_bp_after_character_that_lengthens_when_lowercased(self):
+        # 'İ'.lower() is two code points, shifting everything after it in text_lower
+        text = app.clean_and_normalize_text("Dr. İnce noted blood pressure is 145/95")
+        self.assertEqual(app.extract_vitals_smart(text)['bp'], "145/95")
+
+        text = app.clean_and_normalize_text("İİ BP 120/80 today")
+        self.assertEqual(app.extract_vitals_smart(text)['bp'], "120/80")
+
+
+class SaveBatchTest(unittest.TestCase):
+    def test_failed_batch_saves_nothing(self):
+        rows = [
+            {"consult_id": f"BATCH-{i}", "patient_name": "Jane Doe", "extracted_data": {"vitals_examination": {"bp": "120/80"}}}
+            for i in range(1000)
+        ]
+        # sqlite3 can't bind a dict, so this row fails only once the batch is being written
+        rows[700]["patient_name"] = {"first": "Jane"}
+
+        response = app.app.test_client().post('/save_batch', json={"rows": rows})
+        self.assertEqual(response.status_code, 500)
+
+        with sqlite3.connect(app.DB_PATH) as conn:
+            saved = conn.execute("SELECT COUNT(*) FROM consult_bp WHERE consult_id LIKE 'BATCH-%'").fetchone()[0]
+        self.assertEqual(saved, 0)
+
+
+class StoredReportTest(unittest.TestCase):
+    def test_old_reports_are_swept_when_a_report_is_stored(self):
+        os.makedirs(app.REPORTS_DIR, exist_ok=True)
+        old_path = os.path.join(app.REPORTS_DIR, 'old.pdf')
+        with open(old_path, 'wb') as f:
+            f.write(b'%PDF-')
+        expired = time.time() - app.REPORT_RETENTION_SECONDS - 60
+        os.utime(old_path, (expired, expired))
+
+        app.last_report_sweep = 0.0
+        filename = app.store_report(b'["sweep-test"]', b'%PDF-new')
+
+        self.assertFalse(os.path.exists(old_path))
+        self.assertTrue(os.path.exists(os.path.join(app.REPORTS_DIR, filename)))
+
+
+class GeneratePdfTest(unittest.TestCase):
+    PAYLOAD = {"patient_name": "Jane Doe", "consult_id": "PDF-1", "extracted_data": {"advice": "Rest."}}
+
+    def post(self, headers):
+        return app.app.test_client().post('/generate_pdf', json=self.PAYLOAD, headers=headers)
+
+    def test_pdf_for_pdf_clients(self):
+        response = self.post({'Accept': 'application/pdf'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/pdf')
+        self.assertTrue(response.data.startswith(b'%PDF-'))
+        self.assertIn('Medical_Report_Jane_Doe_PDF-1.pdf', response.headers['Content-Disposition'])
+        self.assertEqual(set(response.vary), {'Accept', 'Accept-Encoding'})
+
+    def test_gzip_when_accepted(self):
+        response = self.post({'Accept': 'application/pdf', 'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertTrue(gzip.decompress(response.data).startswith(b'%PDF-'))
+        self.assertEqual(set(response.vary), {'Accept', 'Accept-Encoding'})
+
+    def test_json_for_json_clients(self):
+        client = app.app.test_client()
+        response = self.post({'Accept': 'application/json'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'application/json')
+        self.assertEqual(set(response.vary), {'Accept', 'Accept-Encoding'})
+
+        body = response.get_json()
+        self.assertEqual(body["status"], "success")
+        self.assertEqual(body["filename"], "Medical_Report_Jane_Doe_PDF-1.pdf")
+        pdf_bytes = base64.b64decode(body["pdf_base64"])
+        self.assertTrue(pdf_bytes.startswith(b'%PDF-'))
+
+        download = client.get('/' + body["pdf_path"])
+        self.assertEqual(download.status_code, 200)
+        self.assertEqual(download.data, pdf_bytes)
+
+    def test_missing_data_rejected(self):
+        response = app.app.test_client().post('/generate_pdf', json={"patient_name": "Jane Doe"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_gzip_refused_with_zero_quality(self):
+        response = app.app.test_client().post('/generate_pdf', json=self.PAYLOAD, headers={
+            'Accept': 'application/pdf', 'Accept-Encoding': 'gzip;q=0, identity'
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertTrue(response.data.startswith(b'%PDF-'))
+
+
+class ProcessAndSaveTest(unittest.TestCase):
+    def post(self, consult_id, query=''):
+        return app.app.test_client().post('/process_and_save' + query, json={
+            "medical_text": "Patient has fever. Blood pressure is 130/85. Paracetamol 500mg for 3 days.",
+            "consult_id": consult_id,
+            "patient_name": "Jane Doe",
+            "patient_age": "45"
+        })
+
+    def saved_count(self, consult_id):
+        with sqlite3.connect(app.DB_PATH) as conn:
+            return conn.execute("SELECT COUNT(*) FROM consult_bp WHERE consult_id = ?", (consult_id,)).fetchone()[0]
+
+    def test_extracts_and_saves(self):
+        response = self.post("PAS-1")
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual(body["status"], "success")
+        self.assertEqual(body["data"]["vitals_examination"]["bp"], "130/85")
+        self.assertEqual(body["data"]["consult_id"], "PAS-1")
+        self.assertNotIn("report", body)
+
+        with sqlite3.connect(app.DB_PATH) as conn:
+            row = conn.execute("SELECT patient_name, patient_age, bp_measured FROM consult_bp WHERE consult_id = 'PAS-1'").fetchone()
+        self.assertEqual(row, ("Jane Doe", "45", "130/85"))
+
+    def test_pdf_report_included_when_asked(self):
+        response = self.post("PAS-PDF", '?pdf=1')
+        self.assertEqual(response.status_code, 200)
+        report = response.get_json()["report"]
+        self.assertEqual(report["filename"], "Medical_Report_Jane_Doe_PAS-PDF.pdf")
+        self.assertTrue(base64.b64decode(report["pdf_base64"]).startswith(b'%PDF-'))
+        self.assertTrue(os.path.exists(os.path.join(app.REPORTS_DIR, report["pdf_path"])))
+        self.assertEqual(self.saved_count("PAS-PDF"), 1)
+
+    def test_missing_fields_rejected(self):
+        response = app.app.test_client().post('/process_and_save', json={"medical_text": "fever"})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.get_json()["error"], "Missing required fields: medical_text, consult_id, patient_name")
+
+    def test_failed_report_still_reports_the_saved_consultation(self):
+        with mock.patch.object(app, 'render_report_pdf', side_effect=RuntimeError("renderer down")):
+            response = self.post("PAS-FAIL", '?pdf=1')
+
+        self.assertEqual(response.status_code, 200)
+        body = response.get_json()
+        self.assertEqual(body["status"], "success")
+        self.assertNotIn("report", body)
+        self.assertIn("renderer down", body["report_error"])
+        self.assertEqual(self.saved_count("PAS-FAIL"), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()